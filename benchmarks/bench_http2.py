@@ -0,0 +1,81 @@
+"""Compares small-file throughput (files/sec) of HttpDownloader (HTTP/1.1) against Http2Downloader (HTTP/2).
+
+Point it at a local h2-capable test server serving a small file, e.g. benchmarks/h2_test_app.py with hypercorn,
+from the repository root:
+
+    pip install hypercorn
+    openssl req -x509 -newkey rsa:2048 -nodes -subj '/CN=localhost' -addext 'subjectAltName=DNS:localhost' -keyout key.pem -out cert.pem
+    hypercorn --certfile cert.pem --keyfile key.pem --bind localhost:8443 benchmarks.h2_test_app:app
+    python benchmarks/bench_http2.py -u https://localhost:8443/small.jpg -k cert.pem -f 2000 -n 32
+"""
+import os
+import sys
+import ssl
+import time
+import getopt
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from mypackages.file_downloader import GenericDownloader
+from mypackages.downloaders import HttpDownloader, Http2Downloader
+from mypackages.downloaders import loadHttpx
+
+def run(downloader, url: str, numFiles: int, numThreads: int, outputDir: str) -> float:
+    urlInfo = GenericDownloader.parseUrl(url)
+    outputFile = os.path.join(outputDir, 'bench_{}.' + (urlInfo.outputFilenameExtension or 'bin'))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=numThreads) as executor:
+        results = list(executor.map(lambda i: downloader.download(urlInfo, outputFile.format(i))[0], range(numFiles)))
+    elapsed = time.perf_counter() - start
+
+    failed = results.count(False)
+    if failed:
+        print('  {} of {} downloads failed'.format(failed, numFiles))
+    return numFiles / elapsed
+
+def main(argv):
+    helpMsg = 'bench_http2.py -u <url> [-f <numfiles=1000> -n <numthreads=32> -k <cafile>]'
+    url, caFile = '', ''
+    numFiles, numThreads = 1000, 32
+
+    opts, args = getopt.getopt(argv, "hu:f:n:k:")
+    for opt, arg in opts:
+        if opt == '-h':
+            print(helpMsg)
+            sys.exit()
+        elif opt == '-u':
+            url = arg
+        elif opt == '-f':
+            numFiles = int(arg)
+        elif opt == '-n':
+            numThreads = int(arg)
+        elif opt == '-k':
+            caFile = arg
+
+    if not url:
+        print(helpMsg)
+        sys.exit(2)
+    if loadHttpx() is None:
+        print('httpx[http2] is not installed, HTTP/2 would fall back to HTTP/1.1')
+        sys.exit(1)
+
+    verify = True
+    if caFile:
+        os.environ['REQUESTS_CA_BUNDLE'] = caFile
+        verify = ssl.create_default_context(cafile=caFile)
+
+    http1 = HttpDownloader(chunkSize=8192, timeout=60.0, poolSize=numThreads)
+    http2 = Http2Downloader(chunkSize=8192, timeout=60.0, http2Hosts=['*'], poolSize=numThreads, verify=verify)
+
+    with tempfile.TemporaryDirectory() as outputDir:
+        print('Downloading {} x {} with {} threads'.format(numFiles, url, numThreads))
+        print('HTTP/1.1: {:.1f} files/sec'.format(run(http1, url, numFiles, numThreads, outputDir)))
+        print('HTTP/2:   {:.1f} files/sec'.format(run(http2, url, numFiles, numThreads, outputDir)))
+        http1.close()
+        http2.close()
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
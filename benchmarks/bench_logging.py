@@ -0,0 +1,74 @@
+"""Measures the logging overhead on the download threads.
+
+Every simulated download logs what GenericDownloader used to log per url (Downloading, SUCCESS and the
+result message at INFO), compared to the current behavior: per-file lines at DEBUG and rate limited 
+progress lines, written by the synchronous StreamHandler or by the AsyncStreamHandler.  The output goes
+to a temporary file so the terminal doesn't dominate the measurement.
+
+    python benchmarks/bench_logging.py [-f <numfiles=20000> -n <numthreads=16>]
+"""
+import os
+import sys
+import time
+import getopt
+import logging
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from mypackages.log_handlers import AsyncStreamHandler
+from mypackages.progress import ProgressReporter
+
+logger = logging.getLogger('bench')
+rootLogger = logging.getLogger()
+
+def perFileLogging(url: str, progress: ProgressReporter) -> None:
+    logger.info('[%s]Downloading URL:%s', 0, url)
+    logger.info('[%s]SUCCESS:%s', 0, url)
+    logger.info('[%s]%s - %s', 0, url, 'success')
+
+def progressLogging(url: str, progress: ProgressReporter) -> None:
+    logger.debug('[%s]Downloading URL:%s', 0, url)
+    logger.debug('[%s]SUCCESS:%s', 0, url)
+    logger.debug('[%s]%s - %s', 0, url, 'success')
+    progress.update(True, 2048)
+
+def run(handler: logging.Handler, work, numFiles: int, numThreads: int) -> float:
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    # On the root logger, so the progress lines of mypackages.progress are formatted and written too
+    rootLogger.handlers = [handler]
+    rootLogger.setLevel(logging.INFO)
+    progress = ProgressReporter(numFiles, 1.0)
+    urls = ['https://i.imgur.com/{:08d}.jpg'.format(i) for i in range(numFiles)]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=numThreads) as executor:
+        list(executor.map(lambda u: work(u, progress), urls))
+    elapsed = time.perf_counter() - start
+    handler.close()
+    return elapsed
+
+def main(argv):
+    numFiles, numThreads = 20000, 16
+    opts, args = getopt.getopt(argv, "f:n:")
+    for opt, arg in opts:
+        if opt == '-f':
+            numFiles = int(arg)
+        elif opt == '-n':
+            numThreads = int(arg)
+
+    print('{} files, {} threads'.format(numFiles, numThreads))
+    with tempfile.TemporaryFile('w') as output:
+        cases = [
+            ('per-file INFO, StreamHandler', logging.StreamHandler, perFileLogging),
+            ('per-file INFO, AsyncStreamHandler', AsyncStreamHandler, perFileLogging),
+            ('progress, StreamHandler', logging.StreamHandler, progressLogging),
+            ('progress, AsyncStreamHandler', AsyncStreamHandler, progressLogging),
+        ]
+        for name, handlerClass, work in cases:
+            elapsed = run(handlerClass(output), work, numFiles, numThreads)
+            print('{:<36}{:>8.3f}s {:>10.1f} us/file'.format(name, elapsed, elapsed / numFiles * 1e6))
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,61 @@
+"""Compares the makespan (total job time) and the average completion time of the schedule policies.
+
+Downloads are simulated: every thread downloads at a fixed bandwidth plus a fixed per-file latency, and the
+threads pick up the urls in the order given by GenericDownloader.orderBySize, the same way startDownloads 
+feeds the ThreadPoolExecutor.  The file sizes are heavy tailed: mostly small files and a few huge ones.
+
+    python benchmarks/bench_schedule.py [-f <numfiles=2000> -n <numthreads=5> -s <seed=0>]
+"""
+import os
+import sys
+import heapq
+import getopt
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from mypackages.file_downloader import GenericDownloader
+from mypackages.downloader_details import SchedulePolicy
+
+BANDWIDTH = 10 * 1024 * 1024
+LATENCY = 0.05
+
+def simulate(sizes, numThreads: int) -> (float, float):
+    """Returns the makespan and the average completion time of downloading sizes in order with numThreads threads"""
+    threads = [0.0] * numThreads
+    completions = []
+    for size in sizes:
+        start = heapq.heappop(threads)
+        end = start + LATENCY + size / BANDWIDTH
+        completions.append(end)
+        heapq.heappush(threads, end)
+    return max(completions), sum(completions) / len(completions)
+
+def main(argv):
+    numFiles, numThreads, seed = 2000, 5, 0
+    opts, args = getopt.getopt(argv, "f:n:s:")
+    for opt, arg in opts:
+        if opt == '-f':
+            numFiles = int(arg)
+        elif opt == '-n':
+            numThreads = int(arg)
+        elif opt == '-s':
+            seed = int(arg)
+
+    rand = random.Random(seed)
+    urls = ['https://host/file{:06d}.bin'.format(i) for i in range(numFiles)]
+    sizes = [int(rand.paretovariate(1.2) * 20 * 1024) for _ in urls]
+    # a few huge files that sort last
+    for i in range(1, 4):
+        sizes[-i] = 2 * 1024 * 1024 * 1024 // i
+    sizeOf = dict(zip(urls, sizes))
+
+    print('{} files, {} threads, {:.1f} GB total'.format(numFiles, numThreads, sum(sizes) / 1024 ** 3))
+    print('{:<16}{:>14}{:>24}'.format('policy', 'makespan (s)', 'avg completion (s)'))
+    for policy in SchedulePolicy:
+        ordered = GenericDownloader.orderBySize(urls, sizes, policy)
+        makespan, avgCompletion = simulate([sizeOf[u] for u in ordered], numThreads)
+        print('{:<16}{:>14.1f}{:>24.1f}'.format(policy.value, makespan, avgCompletion))
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
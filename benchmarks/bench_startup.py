@@ -0,0 +1,93 @@
+"""Checks the startup cost of a short main.py run against a budget.
+
+Runs main.py the way cron does, on a tiny manifest (urls of unsupported protocols, so nothing is downloaded),
+including configuring the logger and writing the result files.  Uses python -X importtime to measure the 
+cumulative import time of everything imported during the run, and fails (exit code 1) if it's over the import 
+budget, if the wall clock time of the run exceeds an empty interpreter start by more than the run budget, or 
+if any protocol library was imported: those should only be imported once a url of their protocol is downloaded.
+
+    python benchmarks/bench_startup.py [-b <importbudgetms=50> -w <runbudgetms=60> -r <runs=10>]
+"""
+import os
+import sys
+import time
+import getopt
+import tempfile
+import statistics
+import subprocess
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+MARKER = '--- running main ---'
+LAZY_MODULES = ('requests', 'paramiko', 'httpx', 'ftplib')
+
+def mainArgs(workDir: str) -> list:
+    manifest = os.path.join(workDir, 'manifest.in')
+    if not os.path.exists(manifest):
+        with open(manifest, 'w') as f:
+            f.write('file://path/to/file.txt\nunknown://path/to/file.txt\n')
+    return ['-s', manifest, '-d', os.path.join(workDir, 'outputs')]
+
+def importTimes(workDir: str) -> dict:
+    """Returns the cumulative import time (us) and the nesting depth of every module imported by a main.py run"""
+    code = 'import sys, runpy; sys.stderr.write("{}\\n"); sys.argv = {!r}; runpy.run_path("main.py", run_name="__main__")'.format(
+        MARKER, ['main.py'] + mainArgs(workDir))
+    output = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True).stderr
+    times = {}
+    for line in output.split(MARKER, 1)[1].splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        times[name.strip()] = (int(cumulative), depth)
+    return times
+
+def wallTime(args, runs: int) -> float:
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + args, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+def main(argv):
+    importBudgetMs, runBudgetMs, runs = 50.0, 60.0, 10
+    opts, args = getopt.getopt(argv, "b:w:r:")
+    for opt, arg in opts:
+        if opt == '-b':
+            importBudgetMs = float(arg)
+        elif opt == '-w':
+            runBudgetMs = float(arg)
+        elif opt == '-r':
+            runs = int(arg)
+
+    with tempfile.TemporaryDirectory() as workDir:
+        samples = [importTimes(workDir) for _ in range(runs)]
+        emptyMs = wallTime(['-c', 'pass'], runs)
+        runMs = wallTime(['main.py'] + mainArgs(workDir), runs)
+
+    importMs = statistics.median(sum(t for t, depth in s.values() if depth == 0) for s in samples) / 1000
+    imports = {n: t for n, (t, depth) in samples[-1].items() if depth == 0}
+
+    print('Slowest imports of a main.py run (cumulative):')
+    for name, us in sorted(imports.items(), key=lambda i: -i[1])[:5]:
+        print('  {:<40}{:>8.1f} ms'.format(name, us / 1000))
+
+    eagerModules = [m for m in samples[-1] if m in LAZY_MODULES]
+    print('Import time of a main.py run: {:.1f} ms (budget {:.1f} ms)'.format(importMs, importBudgetMs))
+    print('python -c pass: {:.1f} ms, main.py run: {:.1f} ms, overhead {:.1f} ms (budget {:.1f} ms)'.format(emptyMs, runMs, runMs - emptyMs, runBudgetMs))
+
+    failed = False
+    if eagerModules:
+        print('FAILED: protocol libraries imported: {}'.format(', '.join(eagerModules)))
+        failed = True
+    if importMs > importBudgetMs:
+        print('FAILED: import time over budget')
+        failed = True
+    if runMs - emptyMs > runBudgetMs:
+        print('FAILED: run time over budget')
+        failed = True
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
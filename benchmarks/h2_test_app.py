@@ -0,0 +1,20 @@
+"""Tiny ASGI app for bench_http2.py: answers every GET with a small file of the size given by the size query
+parameter (2048 bytes by default).  Serve it with an HTTP/2 capable server, e.g. from the repository root:
+
+    pip install hypercorn
+    hypercorn --certfile cert.pem --keyfile key.pem --bind localhost:8443 benchmarks.h2_test_app:app
+"""
+from urllib.parse import parse_qs
+
+async def app(scope, receive, send):
+    if scope['type'] != 'http':
+        return
+
+    query = parse_qs(scope['query_string'].decode())
+    body = b'x' * int(query.get('size', ['2048'])[0])
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [(b'content-type', b'application/octet-stream'), (b'content-length', str(len(body)).encode())]
+    })
+    await send({'type': 'http.response.body', 'body': body if scope['method'] != 'HEAD' else b''})
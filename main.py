@@ -1,6 +1,7 @@
 import sys, getopt
 import configparser
 from mypackages.file_downloader import GenericDownloader
+from mypackages.downloader_details import SchedulePolicy
 import logging
 import logging.config
 
@@ -14,12 +15,18 @@ def configureLogger(logLevel: str):
 
     logging.getLogger().setLevel(numeric_level)
 
+def flushLogger():
+    # Log records are written by a background thread, write them before printing to the console directly
+    for handler in logging.getLogger().handlers:
+        handler.flush()
+
 
 def main(argv):
 
-    helpMsg = 'file_downloader.py -s <sourcelist> -d <destination> [-n <numthreads=5> -c <chunksize=8192> -t <timeout=60.0> -r <delimiter=none> -l <logLevel>]'
+    helpMsg = 'file_downloader.py (-s <sourcelist> -d <destination> | -a <host:port|unix:/path/to/socket>) [-n <numthreads=5> -c <chunksize=8192> -t <timeout=60.0> -r <delimiter=none> -l <logLevel> -H <http2Hosts=none> -o <schedulePolicy=sorted> -p <progressInterval=5.0>]'
     sourceList = ''
     destination = ''
+    address = ''
 
     config = configparser.ConfigParser()
     config.read('./config/file_downloader.ini')
@@ -30,9 +37,12 @@ def main(argv):
     timeout = float(defaults['timeout']) if 'timeout' in defaults else 60.0
     delimiter = delimiter = defaults['delimiter'] if 'delimiter' in defaults else None
     logLevel = logLevel = defaults['logLevel'] if 'logLevel' in defaults else 'INFO'
+    http2Hosts = defaults['http2Hosts'] if 'http2Hosts' in defaults else ''
+    schedulePolicy = defaults['schedulePolicy'] if 'schedulePolicy' in defaults else 'sorted'
+    progressInterval = float(defaults['progressInterval']) if 'progressInterval' in defaults else 5.0
 
     try:
-        opts, args = getopt.getopt(argv, "hs:d:n:c:t:r:l:")
+        opts, args = getopt.getopt(argv, "hs:d:n:c:t:r:l:H:o:p:a:")
     except:
         print(helpMsg)
         sys.exit(2)
@@ -54,20 +64,38 @@ def main(argv):
             delimiter = arg
         elif opt in ('-l'):
             logLevel = arg
+        elif opt in ('-H'):
+            http2Hosts = arg
+        elif opt in ('-o'):
+            schedulePolicy = arg
+        elif opt in ('-p'):
+            progressInterval = float(arg)
+        elif opt in ('-a'):
+            address = arg
         else:
             print('Unrecognized argument: {}'.format(opt))
 
-    if not sourceList or not destination:
+    if not address and (not sourceList or not destination):
         print(helpMsg)
         sys.exit(2)
+    http2Hosts = [h.strip() for h in http2Hosts.split(',') if h.strip()]
     try:
         configureLogger(logLevel)
+        schedulePolicy = SchedulePolicy(schedulePolicy)
+
+        if address:
+            from mypackages.downloader_service import DownloaderService, serve
+            service = DownloaderService(numThreads=numThreads, chunkSize=chunkSize, timeout=timeout, http2Hosts=http2Hosts, schedulePolicy=schedulePolicy, progressInterval=progressInterval)
+            serve(address, service)
+            return
 
-        downloader = GenericDownloader.fromInputFile(sourceList=sourceList, sourceListDelimiter=delimiter, numThreads=numThreads, destination=destination, chunkSize=chunkSize, timeout=timeout)
+        downloader = GenericDownloader.fromInputFile(sourceList=sourceList, sourceListDelimiter=delimiter, numThreads=numThreads, destination=destination, chunkSize=chunkSize, timeout=timeout, http2Hosts=http2Hosts, schedulePolicy=schedulePolicy, progressInterval=progressInterval)
         downloader.startDownloads()
     except (ValueError, OSError) as e:
+        flushLogger()
         print('An unexpected error occured: {}'.format(str(e)))
         
+    flushLogger()
     print('Done!')
     
 if __name__ == "__main__":
@@ -1,4 +1,5 @@
 import time 
+import uuid
 from enum import Enum, unique
 from dataclasses import dataclass, field
 from urllib.parse import urlparse
@@ -15,7 +16,8 @@ class UrlInfo:
     port:str = 0
     outputFilename:str = ''
     outputFilenameExtension:str = ''
-    outputFilenameSuffix:str = str(time.time())
+    # Unique per parsed url, downloads of the same url (e.g. by two jobs of the service) never share an output file
+    outputFilenameSuffix:str = field(default_factory=lambda: '{}_{}'.format(time.time(), uuid.uuid4().hex[:8]))
 
     scheme:str = field(init=False)
     netloc:str = field(init=False)
@@ -47,6 +49,16 @@ class Status(Enum):
     FAILURE = 2,
     INVALID_INPUT = 3
 
+@unique
+class SchedulePolicy(Enum):
+    """Order in which URLs are handed to the download threads.  SORTED keeps the sorted url order, the other
+    policies probe every file's size first.  LARGEST_FIRST minimizes the total time of the job (a huge file 
+    found last won't be downloaded alone at the end) and SMALLEST_FIRST completes the most files early.
+    """
+    SORTED = 'sorted'
+    LARGEST_FIRST = 'largest-first'
+    SMALLEST_FIRST = 'smallest-first'
+
 @dataclass
 class DownloadResult:
     url: str
@@ -0,0 +1,257 @@
+import os
+import json
+import uuid
+import logging
+import threading
+import socketserver
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+from .downloader_details import Status, DownloadResult, SchedulePolicy
+from .file_downloader import GenericDownloader
+
+logger = logging.getLogger(__name__)
+
+class DownloadJob:
+    """A batch of urls submitted to the DownloaderService.  Results are appended as they are collected,
+    streaming readers wait on the condition for new results.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+
+    def __init__(self, downloader: GenericDownloader):
+        self.id = uuid.uuid4().hex
+        self.downloader = downloader
+        # Jobs can share a destination, each job lists its results in its own files
+        self.resultFilesName = 'downloads.' + self.id
+        self.total = len(downloader.downloadsList)
+        self.state = DownloadJob.QUEUED
+        self.status = None
+        self.results = []
+        self.condition = threading.Condition()
+
+    def addResult(self, downloadResult: DownloadResult) -> None:
+        with self.condition:
+            self.results.append(downloadResult)
+            self.condition.notify_all()
+
+    def setState(self, state: str, status: Status = None) -> None:
+        with self.condition:
+            self.state = state
+            self.status = status
+            self.condition.notify_all()
+
+    def summary(self) -> dict:
+        with self.condition:
+            successes = sum(1 for r in self.results if r.status)
+            return {
+                'id': self.id,
+                'state': self.state,
+                'status': self.status.name if self.status else None,
+                'total': self.total,
+                'completed': len(self.results),
+                'successes': successes,
+                'failures': len(self.results) - successes,
+                'mapFile': self.downloader.outputDir + self.resultFilesName + '.map',
+                'errorFile': self.downloader.outputDir + self.resultFilesName + '.error'
+            }
+
+    def waitForResults(self, start: int) -> (List[DownloadResult], bool):
+        """Blocks until there are results after index start or the job is done.
+
+        Returns:
+            (List[DownloadResult], bool): The new results and whether the job is done
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: len(self.results) > start or self.state == DownloadJob.DONE)
+            return self.results[start:], self.state == DownloadJob.DONE
+
+class DownloaderService:
+    def __init__(self, numThreads: int = 5, chunkSize: int = 8192, timeout: float = 60.0, http2Hosts: List[str] = None,
+        schedulePolicy: SchedulePolicy = SchedulePolicy.SORTED, progressInterval: float = 5.0, maxFinishedJobs: int = 1000):
+        """Long lived downloader that runs the jobs submitted to it on a single worker pool.  The worker pool and the
+        protocol downloaders (and with them their connection pools) are kept between jobs, so small batches don't pay
+        the startup and cold connection costs of a new GenericDownloader run.
+
+        Args:
+            numThreads (int, optional): Number of files downloaded in parallel, shared by all jobs
+            chunkSize (int, optional): Determines the number of bytes to download at a time for a single file.
+            timeout (float, optional): Sets the timeout limit for waiting for a connection or for waiting for any activitiy from the server
+            http2Hosts (List[str], optional): Hosts to download over HTTP/2 ('*' for all https hosts)
+            schedulePolicy (SchedulePolicy, optional): Order to download the urls of each job in
+            progressInterval (float, optional): Minimum number of seconds between two progress log lines of a job
+            maxFinishedJobs (int, optional): Number of finished jobs whose status and results are kept, the oldest are dropped
+        """
+        self.numThreads = numThreads
+        self.chunkSize = chunkSize
+        self.timeout = timeout
+        self.http2Hosts = http2Hosts
+        self.schedulePolicy = schedulePolicy
+        self.progressInterval = progressInterval
+        self.maxFinishedJobs = maxFinishedJobs
+
+        self.executor = ThreadPoolExecutor(max_workers=numThreads)
+        self.downloaders = {}
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    def submit(self, urlsList: List[str], destination: str) -> DownloadJob:
+        """Starts downloading the urls in the background.
+
+        Args:
+            urlsList (List[str]): List of urls to be downloaded.
+            destination (str): path/to/output directory for where all downloaded files should be saved to.
+
+        Returns:
+            DownloadJob: The job to query the status and the results of the downloads with
+
+        Raises:
+            ValueError: If parameters urlsList or destination is empty, or not a list of strings and a string
+            OSError: If destination directory is invalid, or inaccessible
+        """
+        if not isinstance(urlsList, list) or not all(isinstance(u, str) for u in urlsList):
+            raise ValueError('urls must be a list of strings')
+        if not isinstance(destination, str) or not destination:
+            raise ValueError('destination must be a non-empty string')
+
+        downloader = GenericDownloader.fromList(urlsList=urlsList, destination=destination, numThreads=self.numThreads, chunkSize=self.chunkSize,
+            timeout=self.timeout, http2Hosts=self.http2Hosts, schedulePolicy=self.schedulePolicy, progressInterval=self.progressInterval)
+
+        with self.lock:
+            # Reuse the warm downloaders of earlier jobs, keep the new ones for later jobs
+            for scheme, schemeDownloader in downloader.downloaders.items():
+                downloader.registerDownloader(scheme, self.downloaders.setdefault(scheme, schemeDownloader))
+
+            job = DownloadJob(downloader)
+            self.jobs[job.id] = job
+
+        logger.info('Job %s: submitted %s urls', job.id, job.total)
+        threading.Thread(target=self.runJob, args=(job,), daemon=True).start()
+        return job
+
+    def runJob(self, job: DownloadJob) -> None:
+        job.setState(DownloadJob.RUNNING)
+        status = Status.FAILURE
+        try:
+            status = job.downloader.startDownloads(executor=self.executor, onResult=job.addResult, resultFilesName=job.resultFilesName)
+        except Exception:
+            logger.exception('Job %s: unexpected error', job.id)
+        finally:
+            job.setState(DownloadJob.DONE, status)
+            logger.info('Job %s: %s', job.id, status.name)
+            self.pruneJobs()
+
+    def pruneJobs(self) -> None:
+        with self.lock:
+            finished = [id for id, job in self.jobs.items() if job.state == DownloadJob.DONE]
+            for id in finished[:max(0, len(finished) - self.maxFinishedJobs)]:
+                del self.jobs[id]
+
+    def getJob(self, id: str) -> DownloadJob:
+        with self.lock:
+            return self.jobs.get(id)
+
+    def listJobs(self) -> List[DownloadJob]:
+        with self.lock:
+            return list(self.jobs.values())
+
+    def shutdown(self) -> None:
+        """Waits for the running downloads to finish and closes all connections"""
+        self.executor.shutdown()
+        with self.lock:
+            for downloader in self.downloaders.values():
+                downloader.close()
+
+class DownloaderRequestHandler(BaseHTTPRequestHandler):
+    """HTTP API of the DownloaderService:
+
+        POST /jobs               {"urls": [...], "destination": "..."}, returns the job summary
+        GET  /jobs               summaries of all jobs
+        GET  /jobs/<id>          summary of the job, status is the job's Status once it's done
+        GET  /jobs/<id>/results  streams the results of the job as JSON lines until the job is done
+    """
+    def do_POST(self):
+        if self.path.rstrip('/') != '/jobs':
+            return self.sendJson(404, {'error': 'Not found'})
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or '{}')
+            if not isinstance(body, dict):
+                raise ValueError('Expected a JSON object with a list of urls and a destination')
+            job = self.server.service.submit(body.get('urls'), body.get('destination'))
+        except (ValueError, OSError) as e:
+            return self.sendJson(400, {'error': str(e)})
+        self.sendJson(202, job.summary())
+
+    def do_GET(self):
+        parts = [p for p in self.path.split('/') if p]
+        if parts == ['jobs']:
+            return self.sendJson(200, [job.summary() for job in self.server.service.listJobs()])
+        if len(parts) not in (2, 3) or parts[0] != 'jobs' or parts[2:] not in ([], ['results']):
+            return self.sendJson(404, {'error': 'Not found'})
+
+        job = self.server.service.getJob(parts[1])
+        if job is None:
+            return self.sendJson(404, {'error': 'Unknown job: {}'.format(parts[1])})
+        if len(parts) == 2:
+            return self.sendJson(200, job.summary())
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.end_headers()
+        index, done = 0, False
+        while not done:
+            results, done = job.waitForResults(index)
+            index += len(results)
+            for r in results:
+                self.wfile.write((json.dumps({'url': r.url, 'status': r.status, 'output': r.output, 'msg': r.msg}) + '\n').encode())
+            self.wfile.flush()
+
+    def sendJson(self, code: int, body) -> None:
+        content = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format: str, *args) -> None:
+        logger.debug(format, *args)
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+def createServer(address: str, service: DownloaderService) -> socketserver.BaseServer:
+    """Creates the HTTP server of the service API.
+
+    Args:
+        address (str): host:port to listen on, or unix:/path/to/socket for a unix socket
+        service (DownloaderService): The service to submit the jobs to
+
+    Raises:
+        ValueError: If the address is invalid
+        OSError: If the address can't be bound
+    """
+    if address.startswith('unix:'):
+        path = address[len('unix:'):]
+        if os.path.exists(path):
+            os.unlink(path)
+        server = UnixHTTPServer(path, DownloaderRequestHandler)
+    else:
+        host, _, port = address.rpartition(':')
+        server = ThreadingHTTPServer((host or '127.0.0.1', int(port)), DownloaderRequestHandler)
+
+    server.service = service
+    return server
+
+def serve(address: str, service: DownloaderService) -> None:
+    """Serves the API on the address until interrupted, then shuts the service down"""
+    server = createServer(address, service)
+    logger.info('Downloader service listening on %s', address)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
@@ -1,21 +1,55 @@
-import requests 
-import ftplib
-import paramiko
 import logging
+import threading
+from functools import lru_cache
+from typing import List
 from .downloader_details import UrlInfo, Status
 
+# The protocol libraries (requests, ftplib, paramiko, httpx) are imported by the downloaders the first time they
+# are used, so a run only pays the import cost of the protocols that are actually in its url list.
+
 logger = logging.getLogger(__name__)
 
+@lru_cache(maxsize=None)
+def loadHttpx():
+    """Imports httpx on first use.  Returns None if httpx or h2 isn't installed"""
+    try:
+        import httpx
+        import h2
+        return httpx
+    except ImportError:
+        return None
+
 class BaseDownloader:
     success = 'success'
+    unknownSize = -1
+    probeSessionPerHost = False
     def __init__(self, chunkSize: int, timeout: float):
         self.chunkSize = chunkSize
         self.timeout = timeout
 
     def download(self, urlInfo: UrlInfo, outputFile: str) -> (bool, str): pass
 
+    def probeSize(self, urlInfo: UrlInfo) -> int:
+        """Cheaply looks up the size in bytes of the file behind the URL without downloading it. 
+        Returns BaseDownloader.unknownSize if the size can't be determined.
+        """
+        return BaseDownloader.unknownSize
+
+    def probeSizes(self, urlInfos: List[UrlInfo]) -> List[int]:
+        """Looks up the sizes of several files on the same host.  Downloaders whose connections are expensive to
+        set up set probeSessionPerHost and override this method to probe all the files over a single connection.
+        """
+        return [self.probeSize(u) for u in urlInfos]
+
+    def close(self) -> None:
+        """Releases any connections kept open between downloads"""
+        pass
+
 class SftpDownloader(BaseDownloader):
+    probeSessionPerHost = True
+
     def download(self, urlInfo: UrlInfo, outputFile: str) -> (bool, str):
+        import paramiko
         try:
             dirToFetch = urlInfo.dirName
             fileToFetch = urlInfo.outputFilename + '.' + urlInfo.outputFilenameExtension
@@ -33,10 +67,53 @@ class SftpDownloader(BaseDownloader):
             logging.exception('Error occurred while downloading via sftp: %s', urlInfo.inputUrl)
             return False, str(e)
 
+    def probeSize(self, urlInfo: UrlInfo) -> int:
+        return self.probeSizes([urlInfo])[0]
+
+    def probeSizes(self, urlInfos: List[UrlInfo]) -> List[int]:
+        import paramiko
+        sizes = [BaseDownloader.unknownSize] * len(urlInfos)
+        first = urlInfos[0]
+        try:
+            with paramiko.SSHClient() as ssh_client:
+                ssh_client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+                ssh_client.connect(hostname=first.hostname, port=first.port, username=first.username, password=first.password, timeout=self.timeout)
+                with (ssh_client.open_sftp()) as sftp_client:
+                    sftp_client.get_channel().settimeout(self.timeout)
+                    for i, urlInfo in enumerate(urlInfos):
+                        fileToFetch = urlInfo.outputFilename + '.' + urlInfo.outputFilenameExtension
+                        try:
+                            sizes[i] = sftp_client.stat(urlInfo.dirName + '/' + fileToFetch).st_size
+                        except IOError as e:
+                            logger.debug('Unable to probe size via sftp: %s - %s', urlInfo.inputUrl, str(e))
+        except (paramiko.SSHException, IOError) as e:
+            logger.debug('Unable to connect via sftp to probe sizes: %s - %s', first.hostname, str(e))
+        return sizes
+
 class HttpDownloader(BaseDownloader):
+    """Downloads http(s) URLs over HTTP/1.1.  Connections are kept alive in a pool of up to poolSize connections 
+    per host and reused by later downloads.
+    """
+    def __init__(self, chunkSize: int, timeout: float, poolSize: int = 10):
+        super().__init__(chunkSize, timeout)
+        self.poolSize = poolSize
+        self.session = None
+        self.sessionLock = threading.Lock()
+
+    def getSession(self):
+        import requests
+        with self.sessionLock:
+            if self.session is None:
+                adapter = requests.adapters.HTTPAdapter(pool_connections=self.poolSize, pool_maxsize=self.poolSize)
+                self.session = requests.Session()
+                self.session.mount('http://', adapter)
+                self.session.mount('https://', adapter)
+            return self.session
+
     def download(self, urlInfo: UrlInfo, outputFile: str) -> (bool, str):
+        import requests
         try:
-            with requests.get(urlInfo.inputUrl, timeout=self.timeout, stream=True) as r:
+            with self.getSession().get(urlInfo.inputUrl, timeout=self.timeout, stream=True) as r:
                 r.raise_for_status()
                 with open(outputFile, 'wb') as f:
                     for chunk in r.iter_content(chunk_size = self.chunkSize):
@@ -47,10 +124,110 @@ class HttpDownloader(BaseDownloader):
         except (requests.exceptions.HTTPError, requests.exceptions.RequestException) as e:
             logging.exception('Error occurred while downloading url: %s', urlInfo.inputUrl)
             return False, str(e)
+
+    def probeSize(self, urlInfo: UrlInfo) -> int:
+        import requests
+        try:
+            r = self.getSession().head(urlInfo.inputUrl, timeout=self.timeout, allow_redirects=True)
+            r.raise_for_status()
+            return int(r.headers.get('Content-Length', BaseDownloader.unknownSize))
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logger.debug('Unable to probe size of url: %s - %s', urlInfo.inputUrl, str(e))
+            return BaseDownloader.unknownSize
+
+    def close(self) -> None:
+        with self.sessionLock:
+            if self.session is not None:
+                self.session.close()
+                self.session = None
+
+class Http2Downloader(HttpDownloader):
+    """Downloads https URLs over HTTP/2 so that many concurrent downloads to the same host are 
+    multiplexed over a few connections instead of one connection per request.  Only the hosts listed 
+    in http2Hosts use HTTP/2 ('*' or an empty list means every host).  Everything else, including 
+    hosts whose servers don't negotiate HTTP/2 or break the HTTP/2 connection, falls back to HttpDownloader.
+    If httpx (with h2) isn't installed, every download falls back to HTTP/1.1.  The httpx client caps the 
+    connections of all its hosts together at maxConnections (poolSize by default), so that hosts that answer 
+    over HTTP/1.1 before they're moved to HttpDownloader don't starve the downloads of the others.
+    """
+    def __init__(self, chunkSize: int, timeout: float, http2Hosts: List[str] = None, maxConnections: int = None, poolSize: int = 10, verify = True):
+        super().__init__(chunkSize, timeout, poolSize)
+        self.http2Hosts = set(http2Hosts or [])
+        self.http1Hosts = set()
+        self.maxConnections = maxConnections or poolSize
+        self.verify = verify
+        self.client = None
+        self.clientLock = threading.Lock()
+
+    def useHttp2(self, urlInfo: UrlInfo) -> bool:
+        if urlInfo.scheme != 'https' or urlInfo.hostname in self.http1Hosts:
+            return False
+        if self.http2Hosts and '*' not in self.http2Hosts and urlInfo.hostname not in self.http2Hosts:
+            return False
+        return loadHttpx() is not None
+
+    def checkHttpVersion(self, urlInfo: UrlInfo, response) -> None:
+        """Moves the host to HttpDownloader if the server didn't negotiate HTTP/2, httpx silently uses HTTP/1.1 then"""
+        if response.http_version != 'HTTP/2' and urlInfo.hostname not in self.http1Hosts:
+            logger.debug('Host %s answered over %s, falling back to HTTP/1.1', urlInfo.hostname, response.http_version)
+            self.http1Hosts.add(urlInfo.hostname)
+
+    def getClient(self):
+        httpx = loadHttpx()
+        with self.clientLock:
+            if self.client is None:
+                limits = httpx.Limits(max_connections=self.maxConnections, max_keepalive_connections=self.maxConnections)
+                self.client = httpx.Client(http2=True, timeout=self.timeout, limits=limits, follow_redirects=True, verify=self.verify)
+            return self.client
+
+    def download(self, urlInfo: UrlInfo, outputFile: str) -> (bool, str):
+        if not self.useHttp2(urlInfo):
+            return super().download(urlInfo, outputFile)
+        httpx = loadHttpx()
+        try:
+            with self.getClient().stream('GET', urlInfo.inputUrl) as r:
+                self.checkHttpVersion(urlInfo, r)
+                r.raise_for_status()
+                with open(outputFile, 'wb') as f:
+                    for chunk in r.iter_bytes(chunk_size = self.chunkSize):
+                        if chunk:
+                            f.write(chunk)
+
+            return True, BaseDownloader.success
+        except (httpx.RemoteProtocolError, httpx.LocalProtocolError):
+            logger.debug('HTTP/2 failed for host %s, falling back to HTTP/1.1', urlInfo.hostname)
+            self.http1Hosts.add(urlInfo.hostname)
+            return super().download(urlInfo, outputFile)
+        except (httpx.HTTPError, IOError) as e:
+            logging.exception('Error occurred while downloading url: %s', urlInfo.inputUrl)
+            return False, str(e)
+
+    def probeSize(self, urlInfo: UrlInfo) -> int:
+        if not self.useHttp2(urlInfo):
+            return super().probeSize(urlInfo)
+        httpx = loadHttpx()
+        try:
+            r = self.getClient().head(urlInfo.inputUrl)
+            self.checkHttpVersion(urlInfo, r)
+            r.raise_for_status()
+            return int(r.headers.get('Content-Length', BaseDownloader.unknownSize))
+        except (httpx.HTTPError, ValueError) as e:
+            logger.debug('Unable to probe size of url: %s - %s', urlInfo.inputUrl, str(e))
+            return BaseDownloader.unknownSize
+
+    def close(self) -> None:
+        with self.clientLock:
+            if self.client is not None:
+                self.client.close()
+                self.client = None
+        super().close()
         
 
 class FtpDownloader(BaseDownloader):
+    probeSessionPerHost = True
+
     def download(self, urlInfo: UrlInfo, outputFile: str) -> (bool, str):
+        import ftplib
         try:
             fileToFetch = urlInfo.outputFilename + '.' + urlInfo.outputFilenameExtension
             with ftplib.FTP() as ftp:
@@ -62,4 +239,27 @@ class FtpDownloader(BaseDownloader):
             return True, BaseDownloader.success
         except ftplib.all_errors as e:
             logging.exception('Error occurred while downloading via ftp: %s', urlInfo.inputUrl)
-            return False, str(e)
\ No newline at end of file
+            return False, str(e)
+
+    def probeSize(self, urlInfo: UrlInfo) -> int:
+        return self.probeSizes([urlInfo])[0]
+
+    def probeSizes(self, urlInfos: List[UrlInfo]) -> List[int]:
+        import ftplib
+        sizes = [BaseDownloader.unknownSize] * len(urlInfos)
+        first = urlInfos[0]
+        try:
+            with ftplib.FTP() as ftp:
+                ftp.connect(host=first.hostname, port=first.port, timeout=self.timeout)
+                ftp.login(first.username, first.password)
+                ftp.voidcmd('TYPE I')
+                for i, urlInfo in enumerate(urlInfos):
+                    fileToFetch = urlInfo.outputFilename + '.' + urlInfo.outputFilenameExtension
+                    try:
+                        size = ftp.size(urlInfo.dirName + '/' + fileToFetch)
+                        sizes[i] = size if size is not None else BaseDownloader.unknownSize
+                    except ftplib.error_perm as e:
+                        logger.debug('Unable to probe size via ftp: %s - %s', urlInfo.inputUrl, str(e))
+        except ftplib.all_errors as e:
+            logger.debug('Unable to connect via ftp to probe sizes: %s - %s', first.hostname, str(e))
+        return sizes
\ No newline at end of file
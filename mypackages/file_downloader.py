@@ -2,20 +2,21 @@
 # coding: utf-8
 
 import threading
+import queue
 import os
 import logging
 from pathlib import Path
 from concurrent.futures import ThreadPoolExecutor
-from typing import List
-from .downloader_details import UrlInfo, Status, DownloadResult
-from .downloaders import FtpDownloader, HttpDownloader, SftpDownloader
+from typing import Callable, List, Set
+from urllib.parse import urlparse
+from .downloader_details import UrlInfo, Status, DownloadResult, SchedulePolicy
+from .progress import ProgressReporter
+from .downloaders import BaseDownloader, FtpDownloader, HttpDownloader, Http2Downloader, SftpDownloader
 
 logger = logging.getLogger(__name__)
 
 class GenericDownloader:
-    downloaders = {}
-        
-    def __init__(self, urlsList: List[str], destination:str, numThreads:int = 5, chunkSize:int = 8192, timeout:float = 60.0):
+    def __init__(self, urlsList: List[str], destination:str, numThreads:int = 5, chunkSize:int = 8192, timeout:float = 60.0, http2Hosts: List[str] = None, schedulePolicy: SchedulePolicy = SchedulePolicy.SORTED, progressInterval: float = 5.0):
         """Will take the list of url inputs as specified as by the parameter urlsList and will attempt to download each of them.
         The downloader can download multiple files in parallel, by default, it's set to download 5 files in parallel but it can 
         be changed via numThreads parameter.  The output file will be saved in the location specified by the destination parameter.
@@ -27,6 +28,11 @@ class GenericDownloader:
             numThreads (int, optional): Determines how many files to download in parallel
             chunkSize (int, optional): Determines the number of bytes to download at a time for a single file.
             timeout (float, optioan): Sets the timeout limit for waiting for a connection or for waiting for any activitiy from the server
+            http2Hosts (List[str], optional): Hosts to download over HTTP/2 ('*' for all https hosts).  By default every 
+                download uses HTTP/1.1.  Hosts that don't support HTTP/2 automatically fall back to HTTP/1.1
+            schedulePolicy (SchedulePolicy, optional): Order to download the urls in.  By default urls are downloaded in sorted 
+                order, LARGEST_FIRST and SMALLEST_FIRST probe the size of every file before downloading
+            progressInterval (float, optional): Minimum number of seconds between two progress log lines
 
         Raises:
             ValueError: If parameters urlsList or destination is empty
@@ -35,11 +41,20 @@ class GenericDownloader:
         if not urlsList or not destination:
             raise ValueError('Required params are missing or empty: urlsList or destination')
         
-        GenericDownloader.initDownloaders(chunkSize, timeout)
-
         self.numThreads = numThreads
+        self.schedulePolicy = schedulePolicy
+        self.progressInterval = progressInterval
+        self.progress = None
         self.outputDir = destination
         self.downloadsList = GenericDownloader.cleanUrlsList(urlsList)
+
+        self.downloaders = {}
+        schemes = set(urlparse(url).scheme for url in self.downloadsList)
+        self.initDownloaders(chunkSize, timeout, http2Hosts, schemes)
+
+        # The download threads only put their results on the queue, startDownloads is the single consumer 
+        # that moves them into successes and failures
+        self.results = queue.SimpleQueue()
         self.successes = []
         self.failures = []
 
@@ -51,7 +66,7 @@ class GenericDownloader:
             os.makedirs(self.outputDir)
 
     @classmethod
-    def fromList(cls, urlsList: List[str], destination: str, numThreads: int = 5, chunkSize: int = 8192, timeout: float = 60.0):
+    def fromList(cls, urlsList: List[str], destination: str, numThreads: int = 5, chunkSize: int = 8192, timeout: float = 60.0, http2Hosts: List[str] = None, schedulePolicy: SchedulePolicy = SchedulePolicy.SORTED, progressInterval: float = 5.0):
         """Factory method that creates an instance of GenericDownloader class given a List of URLs as input.
 
         Args:
@@ -60,6 +75,9 @@ class GenericDownloader:
             numThreads (int, optional): Determines how many files to download in parallel
             chunkSize (int, optional): Determines the number of bytes to download at a time for a single file.
             timeout (float, optioan): Sets the timeout limit for waiting for a connection or for waiting for any activitiy from the server
+            http2Hosts (List[str], optional): Hosts to download over HTTP/2 ('*' for all https hosts)
+            schedulePolicy (SchedulePolicy, optional): Order to download the urls in (sorted, largest-first, smallest-first)
+            progressInterval (float, optional): Minimum number of seconds between two progress log lines
 
         Returns: 
             GenericDownloader instance
@@ -68,10 +86,10 @@ class GenericDownloader:
             ValueError: If parameters urlsList or destination is empty
             OSError: If destination directory is invalid, or inaccessible
         """
-        return cls(urlsList=urlsList, numThreads=numThreads, destination=destination, chunkSize=chunkSize, timeout=timeout)
+        return cls(urlsList=urlsList, numThreads=numThreads, destination=destination, chunkSize=chunkSize, timeout=timeout, http2Hosts=http2Hosts, schedulePolicy=schedulePolicy, progressInterval=progressInterval)
 
     @classmethod
-    def fromInputFile(cls, sourceList: str, destination: str, sourceListDelimiter: str = None, numThreads: int = 5, chunkSize: int = 8192, timeout: float = 60.0):
+    def fromInputFile(cls, sourceList: str, destination: str, sourceListDelimiter: str = None, numThreads: int = 5, chunkSize: int = 8192, timeout: float = 60.0, http2Hosts: List[str] = None, schedulePolicy: SchedulePolicy = SchedulePolicy.SORTED, progressInterval: float = 5.0):
         """Factory method that creates in instance of GenericDownloader class given a path to an input file consisting of URLs list
 
         Args:
@@ -84,6 +102,9 @@ class GenericDownloader:
             chunkSize(int, optional): Determines the number of bytes to download at a time for a single file.
             timeout(float, optioan): Sets the timeout limit for waiting for a connection or for waiting for 
                 any activitiy from the server
+            http2Hosts(List[str], optional): Hosts to download over HTTP/2 ('*' for all https hosts)
+            schedulePolicy(SchedulePolicy, optional): Order to download the urls in (sorted, largest-first, smallest-first)
+            progressInterval(float, optional): Minimum number of seconds between two progress log lines
 
         Returns: 
             GenericDownloader instance
@@ -94,11 +115,19 @@ class GenericDownloader:
             FileNotFoundError: If the file specified by 'pathToFile' does not exist
         """
         urlsList = GenericDownloader.parseInputSources(sourceList, sourceListDelimiter)
-        return cls(urlsList=urlsList, numThreads=numThreads, destination=destination, chunkSize=chunkSize, timeout=timeout)
+        return cls(urlsList=urlsList, numThreads=numThreads, destination=destination, chunkSize=chunkSize, timeout=timeout, http2Hosts=http2Hosts, schedulePolicy=schedulePolicy, progressInterval=progressInterval)
 
-    def startDownloads(self) -> Status:
+    def startDownloads(self, executor: ThreadPoolExecutor = None, onResult: Callable[[DownloadResult], None] = None, resultFilesName: str = 'downloads') -> Status:
         """Will start the download process for all the URLs in the downloadList property of the class.
 
+        Args:
+            executor (ThreadPoolExecutor, optional): Thread pool to download the files with, e.g. a pool shared by many 
+                downloaders.  It is left running afterwards.  By default a new pool of numThreads threads is used.
+            onResult (Callable[[DownloadResult], None], optional): Called with every download result as soon as it's
+                collected
+            resultFilesName (str, optional): Name of the files listing the successful (<name>.map) and failed (<name>.error) 
+                downloads in the destination directory
+
         Returns:
             SUCCESS (DownloaderDetails.Status): If every URL in the downloadList were successful.
             WARNING (DownloaderDetails.Status): If the downloadList had partial success
@@ -108,12 +137,31 @@ class GenericDownloader:
         logger.info('Number of Downloads: %s', str(len(self.downloadsList)))
         logger.info('Downloading %s files in parallel', str(self.numThreads))
         
-        with ThreadPoolExecutor(max_workers=self.numThreads) as executor:
+        ownExecutor = executor is None
+        if ownExecutor:
+            executor = ThreadPoolExecutor(max_workers=self.numThreads)
+        try:
+            if self.schedulePolicy != SchedulePolicy.SORTED:
+                logger.info('Probing file sizes to schedule downloads %s', self.schedulePolicy.value)
+                sizes = self.probeSizes(executor)
+                self.downloadsList = GenericDownloader.orderBySize(self.downloadsList, sizes, self.schedulePolicy)
+
+            self.progress = ProgressReporter(numDownlaods, self.progressInterval)
             for index, url in enumerate(self.downloadsList):
                 executor.submit(self.downloadFile, url, index)
+
+            for _ in range(numDownlaods):
+                downloadResult = self.results.get()
+                self.collectResult(downloadResult)
+                if onResult is not None:
+                    onResult(downloadResult)
+        finally:
+            if ownExecutor:
+                executor.shutdown()
         
-        GenericDownloader.outputResults(self.outputDir + 'downloads.error', self.failures)
-        GenericDownloader.outputResults(self.outputDir + 'downloads.map', self.successes)
+        self.progress.finish()
+        GenericDownloader.outputResults(self.outputDir + resultFilesName + '.error', self.failures)
+        GenericDownloader.outputResults(self.outputDir + resultFilesName + '.map', self.successes)
 
         logger.info('Failed: %s', str(len(self.failures)))
         logger.info('Success: %s', str(len(self.successes)))
@@ -127,9 +175,9 @@ class GenericDownloader:
         return Status.WARNING
     
     def downloadFile(self, url: str, threadId: int = 0) -> bool:  
-        """Download the file specified by the URL.  Records more details of a failure
-        int the failures list.  If the download fails midway, the partially downloaded file 
-        will be deleted.
+        """Download the file specified by the URL.  Puts exactly one result, including more details of a failure,
+        on the results queue, even if an unexpected error is raised.  If the download fails midway, the partially 
+        downloaded file will be deleted.
 
         Args:
             url (str): URL to be downloaded.
@@ -140,28 +188,87 @@ class GenericDownloader:
             True (bool): If the file downloaded successfully
             False (bool): If the file failed to download
         """      
-        logger.info('[%s]Downloading URL:%s',threading.get_ident(), url)
+        try:
+            logger.debug('[%s]Downloading URL:%s',threading.get_ident(), url)
+
+            urlInfo = GenericDownloader.parseUrl(url)
+
+            if not urlInfo.isValid:
+                self.handleDownloadResult(url, False, 'Invalid URL: {}'.format(urlInfo.message))
+                return False
+            
+            scheme = urlInfo.scheme
+            if scheme not in self.downloaders:
+                self.handleDownloadResult(url, False, 'Protocol mising or not supported')
+                return False
+
+            outputFile = GenericDownloader.buildOutputFileFromUrl(self.outputDir, urlInfo)
+            try:
+                result, msg = self.downloaders[scheme].download(urlInfo, outputFile)
+            except Exception as e:
+                logger.exception('Unexpected error occurred while downloading url: %s', url)
+                result, msg = False, str(e)
+
+            self.handleDownloadResult(url, result, msg, outputFile)
+            return True
+        except BaseException as e:
+            # handleDownloadResult queues the result as its last step, so nothing has been queued for this url yet
+            logger.exception('Unexpected error occurred while downloading url: %s', url)
+            self.handleDownloadResult(url, False, 'Unexpected error: {}'.format(repr(e)))
+            if not isinstance(e, Exception):
+                raise
+            return False
 
+    def probeSize(self, url: str) -> int:
+        """Looks up the size of the file specified by the URL without downloading it.
+
+        Args:
+            url (str): URL to probe.
+
+        Returns:
+            int: Size of the file in bytes or BaseDownloader.unknownSize if the URL is invalid, 
+                not supported or the size can't be determined.
+        """
         urlInfo = GenericDownloader.parseUrl(url)
+        if not urlInfo.isValid or urlInfo.scheme not in self.downloaders:
+            return BaseDownloader.unknownSize
 
-        if not urlInfo.isValid:
-            self.handleDownloadResult(url, False, 'Invalid URL: {}'.format(urlInfo.message))
-            return False
-        
-        scheme = urlInfo.scheme
-        if scheme not in GenericDownloader.downloaders:
-            self.handleDownloadResult(url, False, 'Protocol mising or not supported')
-            return False
+        return self.downloaders[urlInfo.scheme].probeSize(urlInfo)
+
+    def probeSizes(self, executor: ThreadPoolExecutor) -> List[int]:
+        """Looks up the sizes of all the urls in downloadsList in parallel on the executor.  The urls of downloaders 
+        with probeSessionPerHost (ftp, sftp) are probed in one task per host, over a single connection.
+
+        Args:
+            executor (ThreadPoolExecutor): Thread pool to probe the sizes with
 
-        outputFile = GenericDownloader.buildOutputFileFromUrl(self.outputDir, urlInfo)
-        result, msg = GenericDownloader.downloaders[scheme].download(urlInfo, outputFile)
-        self.handleDownloadResult(url, result, msg, outputFile)
-        return True
+        Returns:
+            List[int]: Size in bytes of the file of each url in downloadsList, BaseDownloader.unknownSize if unknown.
+        """
+        sizes = [BaseDownloader.unknownSize] * len(self.downloadsList)
+        groups = {}
+        for index, url in enumerate(self.downloadsList):
+            urlInfo = GenericDownloader.parseUrl(url)
+            if not urlInfo.isValid or urlInfo.scheme not in self.downloaders:
+                continue
+            downloader = self.downloaders[urlInfo.scheme]
+            key = (urlInfo.scheme, urlInfo.netloc) if downloader.probeSessionPerHost else index
+            indexes, urlInfos = groups.setdefault(key, ([], []))
+            indexes.append(index)
+            urlInfos.append(urlInfo)
+
+        futures = [(indexes, executor.submit(self.downloaders[urlInfos[0].scheme].probeSizes, urlInfos)) for indexes, urlInfos in groups.values()]
+        for indexes, future in futures:
+            try:
+                for index, size in zip(indexes, future.result()):
+                    sizes[index] = size
+            except Exception:
+                logger.exception('Unexpected error occurred while probing sizes')
+        return sizes
 
     def handleDownloadResult(self, url: str, result: bool, msg: str, outputFile: str = '') -> None:
-        """Records the status of a download along with any relevant messages.  Successful downloads
-        is stored in the successes member variable and failures are stored in the failures member
-        variable.
+        """Records the status of a download along with any relevant messages by putting it on the results
+        queue, it's safe to call from any thread.  Partially downloaded files of failed downloads are deleted.
 
         Args:
             url (str): The download result of the url specified by this parameter
@@ -173,23 +280,40 @@ class GenericDownloader:
         downloadResult = DownloadResult(url=url, msg=msg, output=outputFile, status=result)
 
         threadId = threading.get_ident()
+        # msg is a reserved LogRecord attribute, the message of the download is logged as detail
+        logger.debug('[%s]%s:%s', threadId, 'SUCCESS' if result else 'FAILURE', url,
+            extra={'event': 'result', 'url': url, 'status': result, 'output': outputFile, 'detail': msg})
+        logger.debug('[%s]%s - %s', threadId, url, downloadResult.msg)
 
-        if result:
+        if outputFile and not result:
+            myFile = Path(outputFile)
+            try:
+                if myFile.exists():
+                    logger.debug('Incomplete download found, deleting: %s', outputFile)
+                    myFile.unlink()
+            except OSError:
+                logger.exception('Unable to delete incomplete download: %s', outputFile)
+
+        # Queued last, the consumer must receive exactly one result per url
+        self.results.put(downloadResult)
+    
+    def collectResult(self, downloadResult: DownloadResult) -> None:
+        """Stores a download result taken from the results queue.  Successful downloads are stored in the successes
+        member variable and failures are stored in the failures member variable.  Only called by the consumer of
+        the results queue, so none of the aggregation needs a lock.
+
+        Args:
+            downloadResult (DownloadResult): The result to store
+        """
+        if downloadResult.status:
             self.successes.append(downloadResult)
-            logger.info('[%s]SUCCESS:%s', threadId, url)
         else:
             self.failures.append(downloadResult)
-            logger.info('[%s]FAILURE:%s', threadId, url)
 
-        
-        logger.debug('[%s]%s - %s', threadId, url, downloadResult.msg)
+        if self.progress is not None:
+            outputFile = downloadResult.output
+            self.progress.update(downloadResult.status, os.path.getsize(outputFile) if downloadResult.status and os.path.exists(outputFile) else 0)
 
-        if outputFile and not result:
-            myFile = Path(outputFile)
-            if myFile.exists():
-                logger.debug('Incomplete download found, deleting: %s', outputFile)
-                myFile.unlink()
-    
     def registerDownloader(self, id: str, downloader) -> None:
         """Add a custone URL to support
 
@@ -201,7 +325,7 @@ class GenericDownloader:
                 implemented the download method
         """
         logger.debug('Adding new downloader: %s', id)
-        GenericDownloader.downloaders[id] = downloader
+        self.downloaders[id] = downloader
 
     @staticmethod
     def buildOutputFileFromUrl(outputDir: str, urlInfo: UrlInfo) -> str:
@@ -237,12 +361,39 @@ class GenericDownloader:
 
         return urlInfo
         
+    def initDownloaders(self, chunkSize: int, timeout: float, http2Hosts: List[str] = None, schemes: Set[str] = None) -> None:
+        """Creates the downloaders of the supported protocols.  If schemes is given, only the downloaders for those
+        schemes are created, the libraries of the other protocols are never imported.
+        """
+        factories = {
+            'https': lambda: Http2Downloader(chunkSize, timeout, http2Hosts, poolSize=self.numThreads) if http2Hosts else HttpDownloader(chunkSize, timeout, self.numThreads),
+            'http': lambda: HttpDownloader(chunkSize, timeout, self.numThreads),
+            'ftp': lambda: FtpDownloader(chunkSize, timeout),
+            'sftp': lambda: SftpDownloader(chunkSize, timeout)
+        }
+        for scheme, factory in factories.items():
+            if schemes is None or scheme in schemes:
+                self.downloaders[scheme] = factory()
+
     @staticmethod
-    def initDownloaders(chunkSize: int, timeout: float) -> None:
-        GenericDownloader.downloaders['https'] = HttpDownloader(chunkSize, timeout)
-        GenericDownloader.downloaders['http'] = HttpDownloader(chunkSize, timeout)
-        GenericDownloader.downloaders['ftp'] = FtpDownloader(chunkSize, timeout)
-        GenericDownloader.downloaders['sftp'] = SftpDownloader(chunkSize, timeout)
+    def orderBySize(urlsList: List[str], sizes: List[int], schedulePolicy: SchedulePolicy) -> List[str]:
+        """Orders the urls by their file sizes according to the schedule policy.  Urls with an unknown size
+        are treated as the largest files, since they could be arbitrarily large.  Urls of the same size keep their order.
+
+        Args:
+            urlsList (List[str]): List of urls to order.
+            sizes (List[int]): Size of the file of each url in urlsList, BaseDownloader.unknownSize if unknown.
+            schedulePolicy (SchedulePolicy): LARGEST_FIRST or SMALLEST_FIRST, SORTED returns urlsList unchanged.
+
+        Returns:
+            List[str]: The urls in the order they should be downloaded
+        """
+        if schedulePolicy == SchedulePolicy.SORTED:
+            return list(urlsList)
+
+        keys = [s if s >= 0 else float('inf') for s in sizes]
+        order = sorted(range(len(urlsList)), key=lambda i: keys[i], reverse=(schedulePolicy == SchedulePolicy.LARGEST_FIRST))
+        return [urlsList[i] for i in order]
 
     @staticmethod
     def parseInputSources(pathToFile: str, delimiter: str = None) -> List[str]:
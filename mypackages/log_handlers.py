@@ -0,0 +1,63 @@
+import sys
+import json
+import queue
+import logging
+from logging.handlers import QueueHandler, QueueListener
+
+class AsyncStreamHandler(QueueHandler):
+    """Logging handler that only puts records on a queue, a background thread formats them and writes them
+    to the stream.  The download threads never wait on the stream or on the stream handler's lock.
+    Can be used from config/logging.conf like a StreamHandler:
+
+        [handler_consoleHandler]
+        class=mypackages.log_handlers.AsyncStreamHandler
+        formatter=simpleFormatter
+        args=(sys.stdout,)
+    """
+    def __init__(self, stream=None):
+        super().__init__(queue.SimpleQueue())
+        self.target = logging.StreamHandler(stream if stream is not None else sys.stderr)
+        self.listener = QueueListener(self.queue, self.target)
+        self.listener.start()
+
+    def setFormatter(self, fmt: logging.Formatter) -> None:
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The queue never leaves the process, so formatting is left to the listener thread
+        return record
+
+    def flush(self) -> None:
+        """Waits until the listener thread has written every record queued so far"""
+        with self.lock:
+            if self.listener is not None:
+                self.listener.stop()
+                self.listener.start()
+        self.target.flush()
+
+    def close(self) -> None:
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+        self.target.close()
+        super().close()
+
+class JsonFormatter(logging.Formatter):
+    """Formats every record as a single line JSON object (JSON lines).  Any fields passed to the logger
+    through the extra parameter are included as fields of the object, e.g. the progress events.
+    """
+    standardAttributes = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+    def format(self, record: logging.LogRecord) -> str:
+        event = {
+            'time': self.formatTime(record, self.datefmt),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.thread,
+            'message': record.getMessage()
+        }
+        event.update((k, v) for k, v in vars(record).items() if k not in JsonFormatter.standardAttributes)
+        if record.exc_info:
+            event['exception'] = self.formatException(record.exc_info)
+
+        return json.dumps(event, default=str)
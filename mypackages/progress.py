@@ -0,0 +1,50 @@
+import time
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+class ProgressReporter:
+    """Aggregates the progress of a download job and logs it at most once every interval seconds 
+    (files/sec, MB/s and ETA) instead of logging every single file.
+    """
+    def __init__(self, total: int, interval: float = 5.0):
+        self.total = total
+        self.interval = interval
+        self.completed = 0
+        self.failed = 0
+        self.bytes = 0
+        self.startTime = time.monotonic()
+        self.lastReport = self.startTime
+        self.lastReported = 0
+        self.lock = threading.Lock()
+
+    def update(self, result: bool, numBytes: int = 0) -> None:
+        with self.lock:
+            self.completed += 1
+            self.failed += 0 if result else 1
+            self.bytes += numBytes
+
+            now = time.monotonic()
+            if now - self.lastReport < self.interval:
+                return
+            self.lastReport = now
+            self.report(now)
+
+    def finish(self) -> None:
+        with self.lock:
+            if self.completed != self.lastReported:
+                self.report(time.monotonic())
+
+    def report(self, now: float) -> None:
+        self.lastReported = self.completed
+        elapsed = max(now - self.startTime, 1e-9)
+        filesPerSec = self.completed / elapsed
+        mbPerSec = self.bytes / elapsed / (1024 * 1024)
+        remaining = self.total - self.completed
+        eta = remaining / filesPerSec if filesPerSec else float('inf')
+
+        logger.info('Progress: %s/%s files (%s failed), %.1f files/s, %.2f MB/s, ETA %.0fs', 
+            self.completed, self.total, self.failed, filesPerSec, mbPerSec, eta,
+            extra={'event': 'progress', 'completed': self.completed, 'total': self.total, 'failed': self.failed,
+                'filesPerSec': round(filesPerSec, 2), 'mbPerSec': round(mbPerSec, 3), 'eta': round(eta, 1) if filesPerSec else None})
@@ -1,7 +1,22 @@
 import unittest
+import sys
+import io
+import os
+import json
+import tempfile
+import threading
+import subprocess
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+import logging
 from mypackages.file_downloader import GenericDownloader
-from mypackages.downloader_details import Status, UrlInfo
-from mypackages.downloaders import HttpDownloader, FtpDownloader, SftpDownloader
+from mypackages.downloader_details import Status, UrlInfo, SchedulePolicy
+from mypackages.downloader_service import DownloaderService, createServer
+from mypackages.log_handlers import AsyncStreamHandler, JsonFormatter
+from mypackages.progress import ProgressReporter
+from mypackages.downloaders import loadHttpx, BaseDownloader, HttpDownloader, Http2Downloader, FtpDownloader, SftpDownloader
 
 class TestHttpFileDownloader(unittest.TestCase):
     def setUp(self):
@@ -19,6 +34,70 @@ class TestHttpFileDownloader(unittest.TestCase):
         result, str = downloader.download(urlInfo, self.httpOutputFile)
         self.assertEqual(result, True)
 
+class TestHttp2FileDownloader(unittest.TestCase):
+    def setUp(self):
+        self.httpOutputFile = '.\\tests\\outputs\\test_http2_download.jpg'
+        self.chunkSize = 8192
+        self.timeout=60.0
+
+    def test_http2_file_download_success(self):
+        urlInfo = GenericDownloader.parseUrl('https://i.imgur.com/slmM8rc.jpg')
+
+        downloader = Http2Downloader(chunkSize=self.chunkSize, timeout=self.timeout, http2Hosts=['i.imgur.com'])
+        result, str = downloader.download(urlInfo, self.httpOutputFile)
+        downloader.close()
+        self.assertEqual(result, True)
+
+    def test_http2_selected_per_host(self):
+        downloader = Http2Downloader(chunkSize=self.chunkSize, timeout=self.timeout, http2Hosts=['i.imgur.com'])
+        self.assertEqual(downloader.useHttp2(GenericDownloader.parseUrl('http://i.imgur.com/slmM8rc.jpg')), False)
+        self.assertEqual(downloader.useHttp2(GenericDownloader.parseUrl('https://thumbs.gfycat.com/CheerfulDarlingGlobefish-mobile.mp4')), False)
+
+        if loadHttpx() is not None:
+            self.assertEqual(downloader.useHttp2(GenericDownloader.parseUrl('https://i.imgur.com/slmM8rc.jpg')), True)
+
+        downloader.http1Hosts.add('i.imgur.com')
+        self.assertEqual(downloader.useHttp2(GenericDownloader.parseUrl('https://i.imgur.com/slmM8rc.jpg')), False)
+
+    @unittest.skipIf(loadHttpx() is None, 'httpx[http2] is not installed')
+    def test_http2_protocol_error_falls_back_to_http1(self):
+        httpx = loadHttpx()
+
+        class BrokenClient:
+            def stream(self, method, url):
+                raise httpx.RemoteProtocolError('connection broken')
+
+        urlInfo = GenericDownloader.parseUrl('https://i.imgur.com/slmM8rc.jpg')
+        downloader = Http2Downloader(chunkSize=self.chunkSize, timeout=self.timeout, http2Hosts=['*'])
+        downloader.client = BrokenClient()
+
+        with mock.patch.object(HttpDownloader, 'download', return_value=(True, 'success')) as http1Download:
+            result, msg = downloader.download(urlInfo, self.httpOutputFile)
+
+        self.assertEqual(result, True)
+        http1Download.assert_called_once_with(urlInfo, self.httpOutputFile)
+        self.assertIn('i.imgur.com', downloader.http1Hosts)
+        self.assertEqual(downloader.useHttp2(urlInfo), False)
+
+    @unittest.skipIf(loadHttpx() is None, 'httpx[http2] is not installed')
+    def test_http2_not_negotiated_falls_back_to_http1(self):
+        response = mock.MagicMock(http_version='HTTP/1.1')
+        response.iter_bytes.return_value = [b'data']
+        client = mock.MagicMock()
+        client.stream.return_value.__enter__.return_value = response
+
+        urlInfo = GenericDownloader.parseUrl('https://i.imgur.com/slmM8rc.jpg')
+        downloader = Http2Downloader(chunkSize=self.chunkSize, timeout=self.timeout, http2Hosts=['*'], poolSize=16)
+        downloader.client = client
+
+        with tempfile.TemporaryDirectory() as outputDir:
+            result, msg = downloader.download(urlInfo, os.path.join(outputDir, 'slmM8rc.jpg'))
+
+        self.assertEqual(result, True)
+        self.assertIn('i.imgur.com', downloader.http1Hosts)
+        self.assertEqual(downloader.useHttp2(urlInfo), False)
+        self.assertEqual(downloader.maxConnections, 16)
+
 class TestFtpFileDownloader(unittest.TestCase):
     def setUp(self):
         self.ftpOutputFile = '.\\tests\\outputs\\test_ftp_download.zip'
@@ -119,6 +198,81 @@ class TestGenericDownloader(unittest.TestCase):
 
         self.assertEqual(urlInfo, expectedUrlInfo)
 
+    def test_init_downloaders_only_for_schemes(self):
+        urlsList = ['ftp://speedtest.tele2.net/512KB.zip', 'file://path/to/file.txt']
+        downloader = GenericDownloader.fromList(urlsList=urlsList, destination=self.outputDir)
+        self.assertEqual(set(downloader.downloaders), {'ftp'})
+
+    def test_downloaders_per_instance(self):
+        urlsList = ['https://i.imgur.com/slmM8rc.jpg']
+        downloader1 = GenericDownloader.fromList(urlsList=urlsList, destination=self.outputDir, chunkSize=1024, timeout=5.0)
+        downloader2 = GenericDownloader.fromList(urlsList=urlsList, destination=self.outputDir, chunkSize=4096, timeout=30.0)
+        self.assertEqual(downloader1.downloaders['https'].chunkSize, 1024)
+        self.assertEqual(downloader1.downloaders['https'].timeout, 5.0)
+        self.assertEqual(downloader2.downloaders['https'].chunkSize, 4096)
+
+    def test_unexpected_error_recorded_as_failure(self):
+        urlsList = ['file://path/to/file.txt', 'unknown://path/to/file.txt']
+        downloader = GenericDownloader.fromList(numThreads=2, urlsList=urlsList, destination=self.outputDir)
+        results = []
+
+        with mock.patch.object(GenericDownloader, 'parseUrl', side_effect=RuntimeError('broken parser')):
+            worker = threading.Thread(target=lambda: results.append(downloader.startDownloads()), daemon=True)
+            worker.start()
+            worker.join(timeout=10)
+
+        self.assertEqual(worker.is_alive(), False)
+        self.assertEqual(results, [Status.FAILURE])
+        self.assertEqual(len(downloader.failures), 2)
+
+    def test_unsupported_protocol_failure(self):
+        urlsList = ['file://path/to/file.txt', 'unknown://path/to/file.txt']
+        downloader = GenericDownloader.fromList(numThreads=2, urlsList=urlsList, destination=self.outputDir)
+        result = downloader.startDownloads()
+        self.assertEqual(result, Status.FAILURE)
+        self.assertEqual(len(downloader.failures), 2)
+
+    def test_protocol_libraries_not_imported_at_startup(self):
+        code = 'import sys, mypackages.file_downloader; print(sorted(m for m in ("requests", "paramiko", "httpx") if m in sys.modules))'
+        output = subprocess.run([sys.executable, '-c', code], stdout=subprocess.PIPE, text=True).stdout
+        self.assertEqual(output.strip(), '[]')
+
+    def test_order_by_size_largest_first(self):
+        urlsList = ['https://host/a.jpg', 'https://host/b.jpg', 'https://host/c.jpg', 'https://host/d.jpg']
+        result = GenericDownloader.orderBySize(urlsList, [10, -1, 300, 10], SchedulePolicy.LARGEST_FIRST)
+        self.assertEqual(result, ['https://host/b.jpg', 'https://host/c.jpg', 'https://host/a.jpg', 'https://host/d.jpg'])
+
+    def test_order_by_size_smallest_first(self):
+        urlsList = ['https://host/a.jpg', 'https://host/b.jpg', 'https://host/c.jpg', 'https://host/d.jpg']
+        result = GenericDownloader.orderBySize(urlsList, [10, -1, 300, 10], SchedulePolicy.SMALLEST_FIRST)
+        self.assertEqual(result, ['https://host/a.jpg', 'https://host/d.jpg', 'https://host/c.jpg', 'https://host/b.jpg'])
+
+    def test_probe_sizes_one_session_per_host(self):
+        class SessionDownloader(BaseDownloader):
+            probeSessionPerHost = True
+            def __init__(self):
+                super().__init__(chunkSize=8192, timeout=60.0)
+                self.sessions = []
+            def probeSizes(self, urlInfos):
+                self.sessions.append(sorted(u.hostname for u in urlInfos))
+                return [len(u.outputFilename) for u in urlInfos]
+
+        urlsList = ['custom://host1/a.bin', 'custom://host1/bb.bin', 'custom://host2/ccc.bin', 'file://path/to/file.txt']
+        downloader = GenericDownloader.fromList(urlsList=urlsList, destination=self.outputDir)
+        sessionDownloader = SessionDownloader()
+        downloader.registerDownloader('custom', sessionDownloader)
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            sizes = downloader.probeSizes(executor)
+        self.assertEqual(sizes, [1, 2, 3, BaseDownloader.unknownSize])
+        self.assertEqual(sorted(sessionDownloader.sessions), [['host1', 'host1'], ['host2']])
+
+    def test_https_downloader_largest_first(self):
+        urlsList = ['https://i.imgur.com/slmM8rc.jpg', 'https://i.imgur.com/Zd2ybNv.png']
+        downloader = GenericDownloader.fromList(numThreads=2, urlsList=urlsList, destination=self.outputDir, schedulePolicy=SchedulePolicy.LARGEST_FIRST)
+        result = downloader.startDownloads()
+        self.assertEqual(result, Status.SUCCESS)
+
     def test_parse_http_url_invalid(self):
         url = 'INVALID_URL'
         urlInfo = GenericDownloader.parseUrl(url)
@@ -288,5 +442,140 @@ class TestGenericDownloader(unittest.TestCase):
         result = downloader.startDownloads()
         self.assertEqual(result, Status.SUCCESS)
 
+class TestLogging(unittest.TestCase):
+    def test_progress_rate_limited(self):
+        progress = ProgressReporter(total=3, interval=60.0)
+        with self.assertLogs('mypackages.progress', level='INFO') as logs:
+            progress.update(True, 1024)
+            progress.update(False)
+            progress.update(True, 1024)
+            progress.finish()
+        self.assertEqual(len(logs.records), 1)
+        self.assertEqual(logs.records[0].completed, 3)
+        self.assertEqual(logs.records[0].failed, 1)
+
+    def test_async_handler_flush_writes_queued_records(self):
+        stream = io.StringIO()
+        handler = AsyncStreamHandler(stream)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        testLogger = logging.getLogger('tests.async_handler')
+        testLogger.addHandler(handler)
+        try:
+            for i in range(100):
+                testLogger.warning('line %s', i)
+            handler.flush()
+            self.assertEqual(stream.getvalue().splitlines()[-1], 'line 99')
+        finally:
+            testLogger.removeHandler(handler)
+            handler.close()
+
+    def test_json_formatter_includes_extra_fields(self):
+        record = logging.LogRecord('mypackages.progress', logging.INFO, __file__, 0, 'Progress: %s', ('1/2',), None)
+        record.event = 'progress'
+        event = json.loads(JsonFormatter().format(record))
+        self.assertEqual(event['message'], 'Progress: 1/2')
+        self.assertEqual(event['event'], 'progress')
+
+        with tempfile.TemporaryDirectory() as outputDir:
+            downloader = GenericDownloader.fromList(['unknown://path/to/file.txt'], outputDir)
+            with self.assertLogs('mypackages.file_downloader', level='DEBUG') as logs:
+                downloader.handleDownloadResult('unknown://path/to/file.txt', False, 'Protocol mising or not supported')
+
+        events = [json.loads(JsonFormatter().format(r)) for r in logs.records]
+        results = [e for e in events if e.get('event') == 'result']
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]['url'], 'unknown://path/to/file.txt')
+        self.assertEqual(results[0]['status'], False)
+        self.assertEqual(results[0]['detail'], 'Protocol mising or not supported')
+
+class TestDownloaderService(unittest.TestCase):
+    def setUp(self):
+        tempDir = tempfile.TemporaryDirectory()
+        self.addCleanup(tempDir.cleanup)
+        # The downloader appends a '\\' to the destination, a subdirectory keeps its files inside tempDir on POSIX too
+        self.outputDir = os.path.join(tempDir.name, 'outputs')
+        self.service = DownloaderService(numThreads=2)
+
+    def tearDown(self):
+        self.service.shutdown()
+
+    def test_submit_reuses_downloaders(self):
+        with mock.patch.object(FtpDownloader, 'download', return_value=(False, 'offline')):
+            job1 = self.service.submit(['ftp://speedtest.tele2.net/512KB.zip'], self.outputDir)
+            job2 = self.service.submit(['ftp://speedtest.tele2.net/1KB.zip', 'file://path/to/file.txt'], self.outputDir)
+            self.waitForJob(job1)
+            self.waitForJob(job2)
+
+        self.assertIs(job1.downloader.downloaders['ftp'], job2.downloader.downloaders['ftp'])
+        self.assertIs(self.service.downloaders['ftp'], job1.downloader.downloaders['ftp'])
+        self.assertEqual(job2.summary()['failures'], 2)
+
+    def test_same_url_gets_separate_output_files(self):
+        with mock.patch.object(FtpDownloader, 'download', return_value=(True, 'success')):
+            job1 = self.service.submit(['ftp://speedtest.tele2.net/1KB.zip'], self.outputDir)
+            job2 = self.service.submit(['ftp://speedtest.tele2.net/1KB.zip'], self.outputDir)
+            self.waitForJob(job1)
+            self.waitForJob(job2)
+
+        self.assertNotEqual(job1.results[0].output, job2.results[0].output)
+
+    def startServer(self) -> str:
+        server = createServer('127.0.0.1:0', self.service)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return 'http://127.0.0.1:{}/jobs'.format(server.server_address[1])
+
+    def waitForJob(self, job):
+        index, done = 0, False
+        while not done:
+            results, done = job.waitForResults(index)
+            index += len(results)
+
+    def test_jobs_sharing_destination_keep_their_results(self):
+        job1 = self.service.submit(['file://path/to/file1.txt'], self.outputDir)
+        job2 = self.service.submit(['file://path/to/file2.txt'], self.outputDir)
+        self.waitForJob(job1)
+        self.waitForJob(job2)
+
+        summary1, summary2 = job1.summary(), job2.summary()
+        self.assertNotEqual(summary1['errorFile'], summary2['errorFile'])
+        with open(summary1['errorFile']) as f:
+            self.assertIn('file://path/to/file1.txt', f.read())
+        with open(summary2['errorFile']) as f:
+            self.assertIn('file://path/to/file2.txt', f.read())
+
+    def test_api_submit_and_stream_results(self):
+        baseUrl = self.startServer()
+        body = json.dumps({'urls': ['file://path/to/file.txt', 'unknown://path/to/file.txt'], 'destination': self.outputDir}).encode()
+        with urllib.request.urlopen(urllib.request.Request(baseUrl, data=body, method='POST')) as r:
+            job = json.loads(r.read())
+
+        with urllib.request.urlopen('{}/{}/results'.format(baseUrl, job['id'])) as r:
+            results = [json.loads(l) for l in r.read().splitlines()]
+        self.assertEqual(len(results), 2)
+
+        with urllib.request.urlopen('{}/{}'.format(baseUrl, job['id'])) as r:
+            summary = json.loads(r.read())
+        self.assertEqual(summary['state'], 'done')
+        self.assertEqual(summary['status'], Status.FAILURE.name)
+
+    def test_api_rejects_invalid_values(self):
+        baseUrl = self.startServer()
+        invalidBodies = [
+            {'urls': [1, 2], 'destination': self.outputDir},
+            {'urls': 'file://path/to/file.txt', 'destination': self.outputDir},
+            {'urls': ['file://path/to/file.txt'], 'destination': 5},
+            {'urls': ['file://path/to/file.txt'], 'destination': ''},
+            ['file://path/to/file.txt']
+        ]
+        for body in invalidBodies:
+            request = urllib.request.Request(baseUrl, data=json.dumps(body).encode(), method='POST')
+            with self.assertRaises(urllib.error.HTTPError) as e:
+                urllib.request.urlopen(request)
+            self.assertEqual(e.exception.code, 400)
+            self.assertIn('error', json.loads(e.exception.read()))
+            e.exception.close()
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file